@@ -4,22 +4,35 @@ A lightweight, high-quality voice generator for YouTube narration
 """
 
 import os
+import json
 import uuid
+import hashlib
 import time
 import asyncio
 import threading
+import subprocess
+import re
+import struct
+import wave
+from collections import OrderedDict
 from contextlib import asynccontextmanager
 from pathlib import Path
 from typing import Optional
 from fastapi import FastAPI, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
-import soundfile as sf
 import numpy as np
 from hardware import HardwareDetector
-from backend.engine import engine_manager
+from backend.engine import engine_manager, join_audio
+
+try:
+    import lameenc
+    HAS_LAMEENC = True
+except ImportError:
+    HAS_LAMEENC = False
 
 # System Status (Cached)
 SYSTEM_STATUS = {}
@@ -34,13 +47,31 @@ PREVIEW_DIR.mkdir(exist_ok=True)
 CLEANUP_AGE_SECONDS = 3600
 CLEANUP_INTERVAL_SECONDS = 300  # Check every 5 minutes
 
+# Let nginx serve audio files via X-Accel-Redirect (see README)
+USE_XACCEL = os.getenv("USE_XACCEL", "0") == "1"
+XACCEL_LOCATIONS = {OUTPUT_DIR: "/_audio_internal/", PREVIEW_DIR: "/_preview_internal/"}
+
+# Multi-worker settings
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+LOAD_ENGINE = os.getenv("LOAD_ENGINE", "1") == "1"  # Warm-load Kokoro in each worker at startup
+
+# Output files currently being written (never touched by cleanup)
+_INFLIGHT: set[str] = set()
+
+# Synthesis jobs currently running (memory is only released once this drops to 0)
+_ACTIVE_SYNTHESES = 0
+
+# Synthesis result cache: (text, voice, speed, model) -> generated files
+RESULT_CACHE_SIZE = 256
+_result_cache = OrderedDict()
+_result_cache_lock = threading.Lock()
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Lifecycle manager for startup and shutdown"""
     # Startup
     cleanup_old_files()
-    cleanup_thread = threading.Thread(target=cleanup_scheduler, daemon=True)
-    cleanup_thread.start()
+    cleanup_task = asyncio.create_task(_cleanup_loop())
     
     # Run Hardware Check
     global SYSTEM_STATUS
@@ -48,8 +79,18 @@ async def lifespan(app: FastAPI):
     SYSTEM_STATUS = HardwareDetector.analyze_system()
     print(f"🖥️  System Status: {SYSTEM_STATUS['message']}")
     
+    # Warm-load the engine in this worker (otherwise it loads on first request)
+    if LOAD_ENGINE:
+        await run_in_threadpool(engine_manager.load_kokoro)
+    
+    # Build missing voice previews in the background
+    preview_thread = threading.Thread(target=_prewarm_previews, daemon=True)
+    preview_thread.start()
+    
     yield
-    # Shutdown (if needed)
+    # Shutdown
+    cleanup_task.cancel()
+    engine_manager.shutdown()
 
 # Initialize FastAPI
 app = FastAPI(
@@ -112,6 +153,12 @@ PREVIEW_TEXTS = {
     "h": "नमस्ते! यह मेरी आवाज़ का एक नमूना है।",
 }
 
+# Precomputed lookups for the request hot path
+SAMPLE_RATE = 24000
+_VOICE_LANG = {voice_id: info.get('lang', 'a') for voice_id, info in VOICES.items()}
+_SILENCE_24K_250MS = np.zeros(SAMPLE_RATE // 4, dtype=np.float32)  # 250ms gap between chunks (read-only)
+_SILENCE_24K_250MS.flags.writeable = False
+
 # Request models
 class SynthesizeRequest(BaseModel):
     text: str
@@ -134,39 +181,87 @@ class SynthesizeResponse(BaseModel):
 
 def cleanup_old_files():
     """Delete audio files older than CLEANUP_AGE_SECONDS"""
-    current_time = time.time()
+    cutoff = time.time() - CLEANUP_AGE_SECONDS
     deleted_count = 0
     
-    for file_path in OUTPUT_DIR.glob("*.*"):
-        if file_path.is_file():
-            file_age = current_time - file_path.stat().st_mtime
-            if file_age > CLEANUP_AGE_SECONDS:
+    with os.scandir(OUTPUT_DIR) as entries:
+        for entry in entries:
+            if entry.name in _INFLIGHT or not entry.is_file(follow_symlinks=False):
+                continue
+            if entry.stat(follow_symlinks=False).st_mtime < cutoff:
                 try:
-                    file_path.unlink()
+                    Path(entry.path).unlink(missing_ok=True)
                     deleted_count += 1
                 except Exception as e:
-                    print(f"⚠️ Failed to delete {file_path}: {e}")
+                    print(f"⚠️ Failed to delete {entry.path}: {e}")
     
     if deleted_count > 0:
         print(f"🧹 Auto-cleanup: Deleted {deleted_count} old audio files")
 
 
-def cleanup_scheduler():
-    """Background thread for periodic cleanup"""
+async def _cleanup_loop():
+    """Background task for periodic cleanup"""
     while True:
-        time.sleep(CLEANUP_INTERVAL_SECONDS)
-        cleanup_old_files()
+        await asyncio.sleep(CLEANUP_INTERVAL_SECONDS)
+        try:
+            await run_in_threadpool(cleanup_old_files)
+        except Exception as e:
+            print(f"⚠️ Auto-cleanup failed: {e}")
+
+
+def _to_pcm16(audio) -> bytes:
+    """Float audio in [-1, 1] -> little-endian int16 bytes"""
+    return np.clip(np.asarray(audio, dtype=np.float32) * 32767, -32768, 32767).astype('<i2').tobytes()
+
+
+def write_wav(wav_path: Path, pcm16: bytes, sr: int):
+    """Write 16-bit mono PCM bytes (from _to_pcm16) as WAV through a 1 MB write buffer"""
+    with open(wav_path, 'wb', buffering=1 << 20) as f:
+        with wave.open(f, 'wb') as w:
+            w.setnchannels(1)
+            w.setsampwidth(2)
+            w.setframerate(sr)
+            w.writeframes(pcm16)
+
+
+def encode_mp3_from_pcm(pcm16_mono: bytes, sr: int, out_path: Path):
+    """Encode 16-bit mono PCM bytes at sr Hz to MP3 with one ffmpeg process fed over stdin"""
+    cmd = [
+        "ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
+        "-f", "s16le", "-ar", str(sr), "-ac", "1", "-i", "pipe:0",
+        "-b:a", "192k", "-f", "mp3", str(out_path)
+    ]
+    subprocess.run(
+        cmd,
+        input=pcm16_mono,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        check=True
+    )
 
 
-def convert_to_mp3(wav_path: Path, mp3_path: Path):
-    """Convert WAV to MP3 using pydub"""
+def encode_mp3(pcm16: bytes, sr: int, out_path: Path):
+    """Encode in-memory 16-bit PCM bytes straight to MP3 (lameenc in-process, else ffmpeg)"""
+    if HAS_LAMEENC:
+        try:
+            enc = lameenc.Encoder()
+            enc.set_bit_rate(192)
+            enc.set_in_sample_rate(sr)
+            enc.set_channels(1)
+            enc.set_quality(2)
+            out_path.write_bytes(enc.encode(pcm16) + enc.flush())
+            return True
+        except Exception as e:
+            print(f"⚠️ lameenc MP3 encode failed, trying ffmpeg: {e}")
+    
     try:
-        from pydub import AudioSegment
-        audio = AudioSegment.from_wav(str(wav_path))
-        audio.export(str(mp3_path), format="mp3", bitrate="192k")
+        encode_mp3_from_pcm(pcm16, sr, out_path)
         return True
+    except subprocess.CalledProcessError as e:
+        print(f"⚠️ MP3 encode failed: {e.stderr.decode(errors='ignore').strip()}")
+        return False
     except Exception as e:
-        print(f"⚠️ MP3 conversion failed: {e}")
+        print(f"⚠️ MP3 encode failed: {e}")
         return False
 
 # Serve static files (CSS, JS, Images)
@@ -200,93 +295,174 @@ async def get_system_status():
     return SYSTEM_STATUS
 
 
+def generate_preview(voice_id: str, preview_file: Path):
+    """Generate the MP3 preview sample for a single voice"""
+    lang_code = _VOICE_LANG[voice_id]
+    preview_text = PREVIEW_TEXTS.get(lang_code, PREVIEW_TEXTS['a'])
+    
+    audio_chunks = [audio for _, _, audio in engine_manager.generate(preview_text, voice=voice_id, speed=1.0, lang_code=lang_code)]
+    full_audio = join_audio(audio_chunks)
+
+    # Encode next to the final file and rename it into place, so a half-written
+    # preview is never served (or raced by another worker)
+    tmp_file = preview_file.with_name(f".{preview_file.stem}.{os.getpid()}.tmp")
+    try:
+        if not encode_mp3(_to_pcm16(full_audio), SAMPLE_RATE, tmp_file):
+            raise RuntimeError("MP3 encoding failed")
+        os.replace(tmp_file, preview_file)
+    finally:
+        tmp_file.unlink(missing_ok=True)
+
+
+def _prewarm_previews():
+    """Background thread: generate every missing voice preview once at startup"""
+    # Group by language so each language pipeline is warmed once
+    voice_ids = sorted(VOICES, key=_VOICE_LANG.get)
+    generated = 0
+    
+    for voice_id in voice_ids:
+        preview_file = PREVIEW_DIR / f"{voice_id}.mp3"
+        if preview_file.exists():
+            continue
+        try:
+            generate_preview(voice_id, preview_file)
+            generated += 1
+        except Exception as e:
+            print(f"⚠️ Preview generation failed for {voice_id}: {e}")
+    
+    if generated > 0:
+        print(f"🔊 Generated {generated} voice previews")
+
+
 @app.get("/api/preview/{voice_id}")
 async def get_voice_preview(voice_id: str):
-    """Generate or serve a voice preview sample"""
+    """Serve a pre-generated voice preview sample"""
     
     if voice_id not in VOICES:
         raise HTTPException(status_code=404, detail="Voice not found")
     
-    voice_info = VOICES[voice_id]
-    lang_code = voice_info.get('lang', 'a')
     preview_file = PREVIEW_DIR / f"{voice_id}.mp3"
     
-    # Return cached preview if exists
-    if preview_file.exists():
-        return FileResponse(preview_file, media_type="audio/mpeg")
+    if not preview_file.exists():
+        raise HTTPException(status_code=404, detail="Preview not ready yet")
     
-    # Generate preview
-    try:
-        pipe = get_pipeline(lang_code)
-        preview_text = PREVIEW_TEXTS.get(lang_code, PREVIEW_TEXTS['a'])
-        
-        audio_chunks = []
-        generator = pipe(preview_text, voice=voice_id, speed=1.0)
-        
-        for _, _, audio in generator:
-            audio_chunks.append(audio)
-        
-        full_audio = np.concatenate(audio_chunks) if len(audio_chunks) > 1 else audio_chunks[0]
-        
-        # Save as WAV first
-        wav_path = PREVIEW_DIR / f"{voice_id}.wav"
-        sf.write(str(wav_path), full_audio, 24000)
-        
-        # Convert to MP3
-        convert_to_mp3(wav_path, preview_file)
-        
-        # Remove WAV, keep MP3
-        if preview_file.exists():
-            wav_path.unlink(missing_ok=True)
-        
-        return FileResponse(preview_file, media_type="audio/mpeg")
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Preview generation failed: {str(e)}")
+    return FileResponse(preview_file, media_type="audio/mpeg")
+
 
 
+# A sentence: starts at a non-space and runs to terminal punctuation followed by
+# whitespace (or end of text), so "3.14" and "example.com" don't end a sentence.
+# A punctuation run is only tried from its first character (the lookbehind), so
+# long runs like "....." are scanned once instead of once per position.
+_SENT_RE = re.compile(r'\S.*?(?:(?<![.!?])[.!?]+(?=\s|$)|$)')
+
 
 def chunk_text(text: str, max_chars: int = 350) -> list[str]:
     """
     Split text into chunks that respect sentence boundaries and max character limits.
     Helps prevent Kokoro from truncating long text.
+    Sentences are packed greedily by their (start, end) offsets and each chunk is a
+    single slice of the input, so long texts are never rebuilt with repeated +=.
     """
+    text = text.replace('\n', ' ')
     chunks = []
-    current_chunk = ""
-    
-    # Split by common sentence endings to preserve flow
-    # This is a simple split; for better results, one might use regex or nltk
-    sentences = text.replace('\n', ' ').split('. ')
-    
-    for sentence in sentences:
-        # Re-add the period that was removed by split (if it wasn't just whitespace)
-        if sentence.strip():
-            sentence = sentence.strip()
-            if not sentence.endswith(('.', '!', '?')):
-                 sentence += "."
-            
-            # Check if adding this sentence exceeds limit
-            if len(current_chunk) + len(sentence) + 1 <= max_chars:
-                current_chunk += sentence + " "
-            else:
-                # If current chunk is not empty, push it
-                if current_chunk:
-                    chunks.append(current_chunk.strip())
-                # Start new chunk
-                current_chunk = sentence + " "
+    cur_start = cur_end = None
+    
+    for match in _SENT_RE.finditer(text):
+        start, end = match.span()
+        if cur_start is None:
+            cur_start = start
+        elif end - cur_start > max_chars:
+            # Adding this sentence exceeds the limit, push the current chunk
+            chunks.append(text[cur_start:cur_end])
+            cur_start = start
+        cur_end = end
     
     # Push the last chunk
-    if current_chunk:
-        chunks.append(current_chunk.strip())
+    if cur_start is not None:
+        last = text[cur_start:cur_end].rstrip()
+        if not last.endswith(('.', '!', '?')):
+            last += "."
+        chunks.append(last)
         
     return chunks
 
 
-@app.post("/api/synthesize")
-async def synthesize(request: SynthesizeRequest):
-    """Convert text to speech"""
+async def _save_audio(segments: list, wav_path: Path, mp3_path: Path, sample_rate: int):
+    """
+    Concatenate and convert to 16-bit PCM once, then write the WAV and
+    encode the MP3 from those bytes on two worker threads in parallel.
+    The MP3 is encoded from memory and never reads the WAV back.
+    Returns (duration_seconds, mp3_ok).
+    """
+    full_audio = await asyncio.to_thread(join_audio, segments)
+    
+    # Convert to 16-bit once; both writers share the same bytes
+    pcm16 = await asyncio.to_thread(_to_pcm16, full_audio)
+    
+    # Save WAV file and MP3 (always provide both) at the same time
+    _, mp3_ok = await asyncio.gather(
+        asyncio.to_thread(write_wav, wav_path, pcm16, sample_rate),
+        asyncio.to_thread(encode_mp3, pcm16, sample_rate, mp3_path)
+    )
+    
+    return len(full_audio) / sample_rate, mp3_ok
+
+
+def _result_cache_key(request: SynthesizeRequest) -> str:
+    raw = f"{request.text}|{request.voice}|{round(request.speed, 2)}|{request.model}"
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def _result_cache_get(key: str):
+    """Return a cached result whose files still exist (refreshing their mtime), else None"""
+    with _result_cache_lock:
+        entry = _result_cache.get(key)
+        if entry is None:
+            return None
+        
+        filenames = [entry["wav"]] + ([entry["mp3"]] if entry["mp3"] else [])
+        try:
+            # Touch the files so the cleanup task treats them as fresh
+            for name in filenames:
+                os.utime(OUTPUT_DIR / name)
+        except OSError:
+            # Deleted or cleaned up - forget it
+            del _result_cache[key]
+            return None
+        
+        _result_cache.move_to_end(key)
+        return entry
+
+
+def _result_cache_put(key: str, entry: dict):
+    with _result_cache_lock:
+        _result_cache[key] = entry
+        _result_cache.move_to_end(key)
+        while len(_result_cache) > RESULT_CACHE_SIZE:
+            _result_cache.popitem(last=False)
+
+
+def _synthesize_response(request: SynthesizeRequest, entry: dict) -> SynthesizeResponse:
+    """Build the response for a generated (or cached) result in the requested format"""
+    wav_filename, mp3_filename, duration = entry["wav"], entry["mp3"], entry["duration"]
+    mp3_url = f"/audio/{mp3_filename}" if mp3_filename else None
     
-    # Validate input
+    # Return appropriate format
+    primary_filename = mp3_filename if request.format == "mp3" and mp3_filename else wav_filename
+    
+    return SynthesizeResponse(
+        success=True,
+        audio_url=f"/audio/{primary_filename}",
+        audio_url_mp3=mp3_url,
+        filename=primary_filename,
+        duration=round(duration, 2),
+        message=f"Generated {duration:.1f}s of audio (from {entry['chunks']} chunks)"
+    )
+
+
+def _validate_request(request: SynthesizeRequest):
+    """Shared input validation for the synthesis endpoints"""
     if not request.text or not request.text.strip():
         raise HTTPException(status_code=400, detail="Text cannot be empty")
     
@@ -302,19 +478,54 @@ async def synthesize(request: SynthesizeRequest):
     
     if request.format not in ["wav", "mp3"]:
         raise HTTPException(status_code=400, detail="Format must be 'wav' or 'mp3'")
+
+
+def _begin_synthesis():
+    global _ACTIVE_SYNTHESES
+    _ACTIVE_SYNTHESES += 1
+
+
+async def _end_synthesis():
+    """Releases cached memory (off the event loop) once no other synthesis is running"""
+    global _ACTIVE_SYNTHESES
+    _ACTIVE_SYNTHESES -= 1
+    if _ACTIVE_SYNTHESES == 0:
+        # Keep VRAM/RAM flat across long podcast-style generations
+        await run_in_threadpool(engine_manager.release_memory)
+
+
+def _wav_stream_header(sample_rate: int) -> bytes:
+    """44-byte 16-bit mono WAV header with unknown length (sizes set to 0xFFFFFFFF)"""
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 0xFFFFFFFF, b"WAVE",
+        b"fmt ", 16, 1, 1, sample_rate, sample_rate * 2, 2, 16,
+        b"data", 0xFFFFFFFF
+    )
+
+
+@app.post("/api/synthesize")
+async def synthesize(request: SynthesizeRequest):
+    """Convert text to speech"""
+    
+    _validate_request(request)
+    
+    # Identical request already generated? Serve the existing files
+    cache_key = _result_cache_key(request)
+    cached = _result_cache_get(cache_key)
+    if cached:
+        print(f"♻️ Reusing cached audio: {cached['wav']}")
+        return _synthesize_response(request, cached)
+    
+    # Generate unique filenames
+    file_id = uuid.uuid4().hex
+    wav_filename = f"{file_id}.wav"
+    mp3_filename = f"{file_id}.mp3"
     
+    _begin_synthesis()
     try:
         # Get the language code for this voice
-        voice_info = VOICES[request.voice]
-        lang_code = voice_info.get('lang', 'a')
-        
-        # Get pipeline (Managed by EngineManager now)
-        # pipe = get_pipeline(lang_code)
-        
-        # Generate unique filename
-        file_id = uuid.uuid4().hex
-        wav_filename = f"{file_id}.wav"
-        wav_path = OUTPUT_DIR / wav_filename
+        lang_code = _VOICE_LANG[request.voice]
         
         # Generate audio
         print(f"🎤 Generating audio with voice '{request.voice}' (lang: {lang_code})...")
@@ -324,36 +535,29 @@ async def synthesize(request: SynthesizeRequest):
         print(f"  📄 Split text into {len(text_chunks)} chunks for seamless generation")
         
         all_audio_segments = []
-        silence_duration = 0.25  # 250ms silence between chunks
-        sample_rate = 24000
-        silence_segment = np.zeros(int(sample_rate * silence_duration))
+        sample_rate = SAMPLE_RATE
+        silence_segment = _SILENCE_24K_250MS
         
-        # 2. Generate audio for each chunk
-        for i, chunk in enumerate(text_chunks):
-            print(f"  ⚡ Processing chunk {i+1}/{len(text_chunks)} ({len(chunk)} chars)...")
-            
-            # Generate audio for this chunk (via EngineManager)
-            chunk_audio_pieces = []
-            
-            # Use Engine Manager to generate
-            # Note: generate returns a generator for Kokoro
-            generator = engine_manager.generate(
-                chunk, 
-                voice=request.voice, 
-                speed=request.speed, 
-                model_type=request.model
-            )
-            
-            if generator:
-                try:
-                    for _, _, audio in generator:
-                        chunk_audio_pieces.append(audio)
-                except Exception as e:
-                    print(f"    ⚠️ Chunk generation error: {e}")
-            
-            if chunk_audio_pieces:
-                # Combine pieces of this chunk
-                chunk_full_audio = np.concatenate(chunk_audio_pieces)
+        # 2. Generate audio for the chunks concurrently on the engine's worker threads,
+        # a few at a time so long texts don't flood the GPU/CPU
+        chunk_limit = asyncio.Semaphore(engine_manager.chunks_per_request)
+        
+        async def _gen_chunk(i, chunk):
+            async with chunk_limit:
+                return i, await engine_manager.generate_async(
+                    chunk,
+                    voice=request.voice,
+                    speed=request.speed,
+                    model_type=request.model,
+                    lang_code=lang_code
+                )
+        
+        print(f"  ⚡ Generating {len(text_chunks)} chunks concurrently...")
+        results = await asyncio.gather(*[_gen_chunk(i, c) for i, c in enumerate(text_chunks)])
+        results.sort(key=lambda r: r[0])
+        
+        for i, chunk_full_audio in results:
+            if chunk_full_audio is not None:
                 all_audio_segments.append(chunk_full_audio)
                 
                 # Add silence if not the last chunk
@@ -363,42 +567,158 @@ async def synthesize(request: SynthesizeRequest):
         if not all_audio_segments:
              raise Exception("No audio generated from text")
 
-        # 3. Concatenate all chunks and silences
-        full_audio = np.concatenate(all_audio_segments)
-        
-        # Save WAV file
-        sf.write(str(wav_path), full_audio, sample_rate)
-        
-        # Calculate duration
-        duration = len(full_audio) / sample_rate
-        
-        # Convert to MP3 if requested or always provide both
-        mp3_filename = f"{file_id}.mp3"
+        # 3. Join, save and encode off the event loop
+        wav_path = OUTPUT_DIR / wav_filename
         mp3_path = OUTPUT_DIR / mp3_filename
-        mp3_url = None
         
-        if convert_to_mp3(wav_path, mp3_path):
-            mp3_url = f"/audio/{mp3_filename}"
+        _INFLIGHT.update((wav_filename, mp3_filename))
+        duration, mp3_ok = await _save_audio(all_audio_segments, wav_path, mp3_path, sample_rate)
+        
+        if mp3_ok:
             print(f"✅ Audio saved: {wav_filename} + {mp3_filename} ({duration:.2f}s)")
         else:
             print(f"✅ Audio saved: {wav_filename} ({duration:.2f}s)")
         
-        # Return appropriate format
-        primary_url = f"/audio/{mp3_filename}" if request.format == "mp3" and mp3_url else f"/audio/{wav_filename}"
-        primary_filename = mp3_filename if request.format == "mp3" and mp3_url else wav_filename
+        entry = {
+            "wav": wav_filename,
+            "mp3": mp3_filename if mp3_ok else None,
+            "duration": duration,
+            "chunks": len(text_chunks)
+        }
+        _result_cache_put(cache_key, entry)
         
-        return SynthesizeResponse(
-            success=True,
-            audio_url=primary_url,
-            audio_url_mp3=mp3_url,
-            filename=primary_filename,
-            duration=round(duration, 2),
-            message=f"Generated {duration:.1f}s of audio (from {len(text_chunks)} chunks)"
-        )
+        return _synthesize_response(request, entry)
         
     except Exception as e:
         print(f"❌ Error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Generation failed: {str(e)}")
+    
+    finally:
+        _INFLIGHT.difference_update((wav_filename, mp3_filename))
+        await _end_synthesis()
+
+
+def _stream_response(request: SynthesizeRequest, file_id: str) -> StreamingResponse:
+    """Stream WAV audio for a validated request chunk-by-chunk and save it as file_id"""
+    lang_code = _VOICE_LANG[request.voice]
+    text_chunks = chunk_text(request.text)
+    sample_rate = SAMPLE_RATE
+    silence_segment = _SILENCE_24K_250MS
+    
+    wav_path = OUTPUT_DIR / f"{file_id}.wav"
+    mp3_path = OUTPUT_DIR / f"{file_id}.mp3"
+    
+    print(f"🎤 Streaming audio with voice '{request.voice}' ({len(text_chunks)} chunks)...")
+    
+    def generate_chunk(chunk):
+        return engine_manager.generate_async(
+            chunk,
+            voice=request.voice,
+            speed=request.speed,
+            model_type=request.model,
+            lang_code=lang_code
+        )
+    
+    async def audio_stream():
+        # Chunks are generated in order, one chunk ahead of the client, so the
+        # first bytes only wait for the first chunk
+        pending = None
+        all_audio_segments = []
+        
+        _begin_synthesis()
+        try:
+            yield _wav_stream_header(sample_rate)
+            
+            pending = asyncio.create_task(generate_chunk(text_chunks[0]))
+            for i in range(len(text_chunks)):
+                chunk_audio = await pending
+                pending = None
+                if i + 1 < len(text_chunks):
+                    pending = asyncio.create_task(generate_chunk(text_chunks[i + 1]))
+                
+                if chunk_audio is None:
+                    continue
+                
+                if all_audio_segments:
+                    all_audio_segments.append(silence_segment)
+                    yield _to_pcm16(silence_segment)
+                
+                all_audio_segments.append(chunk_audio)
+                yield _to_pcm16(chunk_audio)
+            
+            # Keep a copy on disk for the regular download URLs
+            if all_audio_segments:
+                _INFLIGHT.update((wav_path.name, mp3_path.name))
+                await _save_audio(all_audio_segments, wav_path, mp3_path, sample_rate)
+        
+        finally:
+            _INFLIGHT.difference_update((wav_path.name, mp3_path.name))
+            # Client went away early - don't start generating for nobody
+            if pending:
+                pending.cancel()
+            await _end_synthesis()
+    
+    return StreamingResponse(
+        audio_stream(),
+        media_type="audio/wav",
+        headers={"X-Audio-Url": f"/audio/{wav_path.name}"}
+    )
+
+
+@app.post("/api/synthesize/stream")
+async def synthesize_stream(request: SynthesizeRequest):
+    """
+    Convert text to speech, streaming WAV audio chunk-by-chunk as it is generated.
+    The full result is also saved to disk; its URL is returned in the X-Audio-Url header.
+    """
+    
+    _validate_request(request)
+    return _stream_response(request, uuid.uuid4().hex)
+
+
+@app.post("/api/synthesize/stream/job")
+async def create_stream_job(request: SynthesizeRequest):
+    """
+    Register a request for the player to stream with a plain GET.
+    An <audio> element can't POST and the text is too long for a URL, so the
+    request is parked on disk (shared by all workers) until the player fetches it.
+    """
+    
+    _validate_request(request)
+    
+    file_id = uuid.uuid4().hex
+    job = {
+        "text": request.text,
+        "voice": request.voice,
+        "speed": request.speed,
+        "format": request.format,
+        "model": request.model
+    }
+    (OUTPUT_DIR / f"{file_id}.job.json").write_text(json.dumps(job), encoding="utf-8")
+    
+    return {
+        "success": True,
+        "stream_url": f"/api/synthesize/stream/{file_id}",
+        "audio_url": f"/audio/{file_id}.wav",
+        "audio_url_mp3": f"/audio/{file_id}.mp3"
+    }
+
+
+@app.get("/api/synthesize/stream/{file_id}")
+async def play_stream_job(file_id: str):
+    """Stream the audio for a job created by /api/synthesize/stream/job (single use)"""
+    
+    if not re.fullmatch(r"[0-9a-f]{32}", file_id):
+        raise HTTPException(status_code=400, detail="Invalid stream id")
+    
+    job_path = OUTPUT_DIR / f"{file_id}.job.json"
+    try:
+        job = json.loads(job_path.read_text(encoding="utf-8"))
+        job_path.unlink()
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Stream not found or already played")
+    
+    return _stream_response(SynthesizeRequest(**job), file_id)
 
 
 @app.get("/audio/{filename}")
@@ -420,6 +740,14 @@ async def get_audio(filename: str):
     # Determine media type
     media_type = "audio/mpeg" if filename.endswith(".mp3") else "audio/wav"
     
+    # Hand the transfer to the reverse proxy (kernel sendfile, no Python copies)
+    if USE_XACCEL:
+        return Response(headers={
+            "X-Accel-Redirect": f"{XACCEL_LOCATIONS[file_path.parent]}{filename}",
+            "Content-Type": media_type,
+            "Content-Disposition": f'attachment; filename="{filename}"'
+        })
+    
     return FileResponse(
         file_path,
         media_type=media_type,
@@ -446,14 +774,15 @@ async def delete_audio(filename: str):
 @app.get("/api/cleanup")
 async def manual_cleanup():
     """Manually trigger cleanup of old files"""
-    cleanup_old_files()
+    await run_in_threadpool(cleanup_old_files)
     return {"success": True, "message": "Cleanup completed"}
 
 
 
 
 
-if __name__ == "__main__":
+def main():
+    """Run the server (used by `python app.py` and the launcher)"""
     import uvicorn
     print("""
     ╔═══════════════════════════════════════════════════════════╗
@@ -464,4 +793,8 @@ if __name__ == "__main__":
     ║   Version: 1.0.0 (Local Lab Release)                      ║
     ╚═══════════════════════════════════════════════════════════╝
     """)
-    uvicorn.run(app, host="0.0.0.0", port=8000, reload=False)
+    uvicorn.run("app:app", host="0.0.0.0", port=8000, reload=False, workers=WEB_CONCURRENCY)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,12 @@
 
 import os
+import gc
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import torch
 import logging
+import numpy as np
 from kokoro import KPipeline
 from .model_styletts2 import StyleTTS2
 
@@ -9,6 +14,35 @@ from .model_styletts2 import StyleTTS2
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# KModel runs one sequence per forward pass, so chunks are spread across worker
+# threads instead of batched. Bounded so long jobs can't flood the GPU/CPU.
+CHUNK_WORKERS_GPU = 4
+CHUNK_WORKERS_CPU = 2
+
+# Chunks a single request may have in flight, so one long job leaves workers for
+# other users (on CPU, torch's own intra-op threads already use every core)
+CHUNKS_PER_REQUEST_GPU = 2
+CHUNKS_PER_REQUEST_CPU = 1
+
+
+def join_audio(pieces):
+    """
+    Joins audio pieces (NumPy arrays or CPU torch tensors) into one float32 array.
+    Sums the lengths first and fills a single preallocated buffer, so there is
+    exactly one allocation and no implicit upcast to float64.
+    """
+    total = 0
+    for piece in pieces:
+        total += len(piece)
+    
+    buf = np.empty(total, dtype=np.float32)
+    offset = 0
+    for piece in pieces:
+        buf[offset:offset + len(piece)] = piece
+        offset += len(piece)
+    return buf
+
+
 class EngineManager:
     """
     Manages the two voice engines:
@@ -20,37 +54,96 @@ class EngineManager:
         logger.info(f"EngineManager initialized on {self.device}")
         
         # Engines
-        self.kokoro_pipeline = None
+        self.kokoro_pipelines = {}  # lang_code -> KPipeline (all share one KModel)
+        self._kokoro_model = None      # The shared eager KModel
+        self._kokoro_compiled = None   # Its torch.compile wrapper (GPU only)
+        self._kokoro_loaded = False    # Set once load_kokoro has loaded (and compiled) it
         self.styletts_model = None
+        self._kokoro_load_lock = threading.Lock()
+        self._kokoro_lock = threading.Lock()
+        self._styletts_lock = threading.Lock()
+
+        # Worker threads for chunk generation (see generate_async)
+        workers = CHUNK_WORKERS_GPU if self.device == 'cuda' else CHUNK_WORKERS_CPU
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tts-chunk")
+        self.chunks_per_request = CHUNKS_PER_REQUEST_GPU if self.device == 'cuda' else CHUNKS_PER_REQUEST_CPU
         
-        # Load Lite immediately
-        self.load_kokoro()
+        # Lite is warm-loaded per worker from the app lifespan (see LOAD_ENGINE),
+        # so importing this module in a uvicorn supervisor stays cheap
 
     def load_kokoro(self):
-        """Loads the lightweight Kokoro model"""
-        if self.kokoro_pipeline: return
+        """Loads the lightweight Kokoro model (at startup, or lazily from generate)"""
+        if self._kokoro_loaded: return
         
-        logger.info("Loading Kokoro (Lite)...")
-        try:
-            # Existing Kokoro logic adapted
-            self.kokoro_pipeline = KPipeline(lang_code='a') 
-            logger.info("✅ Kokoro Loaded")
-        except Exception as e:
-            logger.error(f"❌ Failed to load Kokoro: {e}")
+        with self._kokoro_load_lock:
+            if self._kokoro_loaded: return
+            
+            logger.info("Loading Kokoro (Lite)...")
+            try:
+                pipeline = self.get_pipeline('a')
+                logger.info("✅ Kokoro Loaded")
+            except Exception as e:
+                logger.error(f"❌ Failed to load Kokoro: {e}")
+                return
+            
+            self._compile_kokoro(pipeline)
+            self._kokoro_loaded = True
+
+    def _compile_kokoro(self, pipeline):
+        """Compiles the shared KModel on GPU (later language pipelines reuse it)"""
+        # Default mode: 'reduce-overhead' records a new CUDA graph for every input length
+        if hasattr(torch, 'compile') and self.device == 'cuda':
+            try:
+                logger.info("⚡ Compiling Kokoro with torch.compile...")
+                pipeline.model = torch.compile(self._kokoro_model, fullgraph=False)
+                # Warm up so the first real request doesn't pay the compile time
+                for _ in pipeline("Warming up.", voice='af_heart'):
+                    pass
+                self._kokoro_compiled = pipeline.model
+                logger.info("✅ Kokoro compiled")
+            except Exception as e:
+                logger.warning(f"torch.compile failed, using eager Kokoro: {e}")
+                pipeline.model = self._kokoro_model
+
+    def get_pipeline(self, lang_code='a'):
+        """Returns the Kokoro pipeline for a language, creating it on first use"""
+        pipeline = self.kokoro_pipelines.get(lang_code)
+        if pipeline: return pipeline
+        
+        with self._kokoro_lock:
+            if lang_code not in self.kokoro_pipelines:
+                # Reuse the already loaded KModel so only the G2P frontend is new.
+                # KPipeline only accepts an eager KModel here (a compiled wrapper would
+                # make it load a fresh model), so the compiled one is swapped in after.
+                logger.info(f"Loading Kokoro pipeline for lang '{lang_code}'...")
+                pipeline = KPipeline(lang_code=lang_code, model=self._kokoro_model if self._kokoro_model is not None else True)
+                if self._kokoro_model is None:
+                    self._kokoro_model = pipeline.model
+                if self._kokoro_compiled is not None:
+                    pipeline.model = self._kokoro_compiled
+                self.kokoro_pipelines[lang_code] = pipeline
+            return self.kokoro_pipelines[lang_code]
 
     def load_styletts(self):
         """Lazy loads the heavy StyleTTS 2 model"""
         if self.styletts_model: return
         
-        logger.info("Loading StyleTTS 2 (Pro)...")
-        try:
-            self.styletts_model = StyleTTS2(quantized=True)
-            self.styletts_model.load_weights()
-        except Exception as e:
-            logger.error(f"❌ Failed to load StyleTTS 2: {e}")
-            raise e
+        # Concurrent chunks wait for one load; the model is only published once
+        # it is fully loaded and compiled
+        with self._styletts_lock:
+            if self.styletts_model: return
+            
+            logger.info("Loading StyleTTS 2 (Pro)...")
+            try:
+                model = StyleTTS2(quantized=True)
+                model.load_weights()
+                model.compile()
+            except Exception as e:
+                logger.error(f"❌ Failed to load StyleTTS 2: {e}")
+                raise e
+            self.styletts_model = model
 
-    def generate(self, text, voice, speed, model_type="kokoro"):
+    def generate(self, text, voice, speed, model_type="kokoro", lang_code='a'):
         """Unified Generation Interface (Generator)"""
         
         # PRO MODE
@@ -76,9 +169,41 @@ class EngineManager:
                     # Fallback to Kokoro below
             
         # STANDARD MODE (or Fallback)
-        if not self.kokoro_pipeline: self.load_kokoro()
+        # Goes through load_kokoro so a lazy first load (LOAD_ENGINE=0) is compiled too
+        self.load_kokoro()
+        pipeline = self.get_pipeline(lang_code)
         
         # Kokoro returns a generator, so we use yield from
-        yield from self.kokoro_pipeline(text, voice=voice, speed=speed)
+        yield from pipeline(text, voice=voice, speed=speed)
+
+    def generate_chunk(self, text, voice, speed, model_type="kokoro", lang_code='a'):
+        """Generates a single chunk and returns its joined audio (None if it failed)"""
+        pieces = []
+        try:
+            with torch.no_grad():
+                for _, _, audio in self.generate(text, voice, speed, model_type, lang_code):
+                    pieces.append(audio)
+        except Exception as e:
+            logger.error(f"Chunk generation error: {e}")
+        return join_audio(pieces) if pieces else None
+
+    def release_memory(self):
+        """Returns cached allocator memory so long jobs don't creep upwards"""
+        if self.device == 'cuda':
+            torch.cuda.empty_cache()
+            torch.cuda.ipc_collect()
+        else:
+            gc.collect()
+
+    def shutdown(self):
+        """Stops the chunk workers, dropping chunks that haven't started"""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def generate_async(self, text_chunk, voice, speed, model_type="kokoro", lang_code='a'):
+        """Generates a chunk on a worker thread and returns its audio (or None)"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, self.generate_chunk, text_chunk, voice, speed, model_type, lang_code
+        )
 
 engine_manager = EngineManager()
@@ -2,8 +2,10 @@ import torch
 import logging
 import os
 import time
+import contextlib
 try:
-    from styletts2.tts import StyleTTS2 as StyleTTS2Wrapper
+    from styletts2.tts import StyleTTS2 as StyleTTS2Wrapper, DEFAULT_TARGET_VOICE_URL
+    from cached_path import cached_path
     HAS_STYLE_TTS = True
 except ImportError:
     HAS_STYLE_TTS = False
@@ -11,6 +13,20 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# Adaptive diffusion steps: (max text length, steps). Longer text gets more steps,
+# up to the previous fixed default of 5 for full 350-character chunks (see chunk_text)
+DIFFUSION_STEPS_BY_LENGTH = [(100, 3), (250, 4)]
+DIFFUSION_STEPS_LONG = 5
+
+
+def diffusion_steps_for(text):
+    """Fewer diffusion steps for short text, more for long passages"""
+    for max_len, steps in DIFFUSION_STEPS_BY_LENGTH:
+        if len(text) <= max_len:
+            return steps
+    return DIFFUSION_STEPS_LONG
+
+
 class StyleTTS2:
     """
     Wrapper for StyleTTS 2 Model using the 'styletts2' pip package.
@@ -21,6 +37,8 @@ class StyleTTS2:
         self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
         self.model_wrapper = None
         self.loaded = False
+        self.dtype = torch.float32
+        self._style_cache = {}  # voice path -> style vector (ref_s)
         
         logger.info(f"Initializing StyleTTS 2 Wrapper (Quantized={quantized}) on {self.device}")
 
@@ -40,24 +58,31 @@ class StyleTTS2:
             
             logger.info(f"Base model loaded in {time.time() - start_time:.2f}s")
 
+            # HALF PRECISION (GPU) 🚀
+            # FP16 autocast halves activation bandwidth and runs matmuls on tensor cores.
+            # Weights stay FP32, so falling back to full precision loses nothing.
+            # (BF16 is skipped: the wrapper returns NumPy, which has no bfloat16)
+            if self.device == 'cuda':
+                logger.info("⚡ Enabling FP16 autocast for StyleTTS 2...")
+                self.dtype = torch.float16
+
             # QUANTIZATION (The Magic Trick for Laptops) 🪄
-            if self.quantized and self.device == 'cpu':
+            elif self.quantized:
                 logger.info("⚡ Applying PyTorch Dynamic Quantization (Int8)...")
                 q_start = time.time()
-                
-                # Access the internal torch model
-                # The 'styletts2' wrapper stores the model in .model usually, or we access parts
-                internal_model = self.model_wrapper.model 
+                torch.set_num_threads(os.cpu_count() or 1)
                 
                 try:
-                    # We quantize the Linear layers of the generator/bert portions
+                    # Weight-only int8 for the Linear layers of the generator/bert portions
                     # This reduces their size by ~4x (32-bit float -> 8-bit int)
-                    torch.quantization.quantize_dynamic(
-                        internal_model, 
-                        {torch.nn.Linear, torch.nn.LSTM, torch.nn.GRU}, 
-                        dtype=torch.qint8,
-                        inplace=True
-                    )
+                    # LSTM/GRU are left in float: quantizing them regresses quality
+                    for module in self._modules():
+                        torch.ao.quantization.quantize_dynamic(
+                            module, 
+                            {torch.nn.Linear}, 
+                            dtype=torch.qint8,
+                            inplace=True
+                        )
                     logger.info(f"✅ Quantization applied in {time.time() - q_start:.2f}s")
                 except Exception as qe:
                     logger.warning(f"Quantization warning (partial or failed): {qe}")
@@ -69,7 +94,63 @@ class StyleTTS2:
             logger.error(f"❌ Failed to load StyleTTS 2: {e}")
             raise e
 
-    def inference(self, text, voice=None, speed=1.0):
+    def compile(self):
+        """
+        Compiles the StyleTTS 2 modules with torch.compile (GPU only) and warms
+        them up with a dummy inference. Falls back to eager on any failure.
+        """
+        if not self.loaded or self.device != 'cuda' or not hasattr(torch, 'compile'):
+            return
+        
+        internal_model = self.model_wrapper.model
+        if not isinstance(internal_model, dict):
+            logger.warning("Unexpected StyleTTS 2 model layout - skipping torch.compile")
+            return
+        
+        eager_modules = dict(internal_model)
+        logger.info("⚡ Compiling StyleTTS 2 with torch.compile...")
+        c_start = time.time()
+        try:
+            for name, module in eager_modules.items():
+                if isinstance(module, torch.nn.Module):
+                    # Default mode: 'reduce-overhead' records a CUDA graph per input length
+                    internal_model[name] = torch.compile(module, fullgraph=False)
+            
+            # Warm up so the first real request doesn't pay the compile time
+            self._run(text="Warming up.", target_voice_path=None, diffusion_steps=5)
+            logger.info(f"✅ StyleTTS 2 compiled in {time.time() - c_start:.2f}s")
+        except Exception as e:
+            logger.warning(f"torch.compile failed, using eager StyleTTS 2: {e}")
+            internal_model.update(eager_modules)
+
+    def _modules(self):
+        """The wrapper's .model is either a single nn.Module or a dict of them"""
+        internal_model = self.model_wrapper.model
+        if isinstance(internal_model, dict):
+            return [m for m in internal_model.values() if isinstance(m, torch.nn.Module)]
+        return [internal_model]
+
+    def _autocast(self):
+        if self.dtype == torch.float32:
+            return contextlib.nullcontext()
+        return torch.autocast('cuda', dtype=self.dtype)
+
+    def _run(self, **kwargs):
+        with self._autocast():
+            return self.model_wrapper.inference(**kwargs)
+
+    def get_style(self, target_voice_path=None):
+        """Speaker-encoder output for a reference voice, computed once per voice"""
+        key = target_voice_path or "default"
+        style = self._style_cache.get(key)
+        if style is None:
+            path = target_voice_path or cached_path(DEFAULT_TARGET_VOICE_URL)
+            with self._autocast():
+                style = self.model_wrapper.compute_style(path)
+            self._style_cache[key] = style
+        return style
+
+    def inference(self, text, voice=None, speed=1.0, diffusion_steps=None):
         if not self.loaded:
             raise RuntimeError("Model not loaded")
         
@@ -81,16 +162,32 @@ class StyleTTS2:
             if voice and voice.endswith(".wav") and os.path.exists(voice):
                 target_voice_path = voice
             
+            if diffusion_steps is None:
+                diffusion_steps = diffusion_steps_for(text)
+            
             # Use the wrapper's inference function (NOT generate)
             # Output is a NumPy array
-            audio_array = self.model_wrapper.inference(
+            params = dict(
                 text=text,
-                target_voice_path=target_voice_path, # Pass None for default voice
                 alpha=0.3, # Controls timbre (default)
                 beta=0.7,  # Controls prosody (default)
-                diffusion_steps=5, # Reduced steps for speed (5-10 is good for fast inference)
+                diffusion_steps=diffusion_steps, # 3-5 depending on text length
                 embedding_scale=1.0
             )
+            try:
+                audio_array = self._run(ref_s=self.get_style(target_voice_path), **params)
+            except torch.cuda.OutOfMemoryError:
+                # FP32 would need even more memory - not a precision problem
+                raise
+            except RuntimeError as e:
+                if self.dtype == torch.float32:
+                    raise
+                # Some ops reject half inputs - stop autocasting for good.
+                # Only a flag changes, so other threads' inferences are unaffected.
+                logger.warning(f"FP16 inference failed ({e}), reverting to FP32")
+                self.dtype = torch.float32
+                self._style_cache.clear()
+                audio_array = self._run(ref_s=self.get_style(target_voice_path), **params)
             
             # Speed adjustment (if library doesn't support it directly, we might need post-processing)
             # For now, we return the raw audio.
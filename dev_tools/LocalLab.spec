@@ -6,7 +6,7 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[],
-    hiddenimports=[],
+    hiddenimports=['_launcher_paths'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
@@ -0,0 +1,21 @@
+"""
+Torch probe run by hardware.py in its own interpreter.
+Prints one JSON status line on stdout and exits.
+"""
+import json
+import sys
+
+try:
+    import torch
+
+    available = torch.cuda.is_available()
+    status = {
+        "available": available,
+        "name": torch.cuda.get_device_name(0) if available else None,
+        "count": torch.cuda.device_count() if available else 0
+    }
+except Exception as e:
+    status = {"available": False, "error": f"Check failed: {str(e)}"}
+
+sys.stdout.write(json.dumps(status) + "\n")
+sys.stdout.flush()
@@ -15,6 +15,18 @@ PRO_DIR = os.path.join(OUTPUT_DIR, "LocalLab_Pro")
 
 # Embedded Python Executable Path (Relative to portable root)
 PYTHON_REL = r"python\python.exe"
+APP_REL = "app"
+
+# Generated module baked into the LocalLab.exe launcher (see LocalLab.spec)
+LAUNCHER_PATHS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "_launcher_paths.py")
+
+def write_launcher_paths():
+    """Bakes the fixed release layout into the launcher so it skips path probing at startup"""
+    with open(LAUNCHER_PATHS_FILE, "w", encoding="utf-8") as f:
+        f.write("# Generated by build_release.py - do not edit\n")
+        f.write(f"PYTHON_EXE = r\"{PYTHON_REL}\"\n")
+        f.write(f"APP_DIR = r\"{APP_REL}\"\n")
+    print(f"   Wrote launcher layout to {LAUNCHER_PATHS_FILE}")
 
 def run_pip(env_root, args):
     """Runs pip inside the specific environment"""
@@ -46,7 +58,7 @@ def build_variant(variant_name, dest_dir, pip_commands):
     shutil.copytree(PORTABLE_SRC, dest_dir)
     
     # 2. Update Source Code (App Folder)
-    app_dest = os.path.join(dest_dir, "app")
+    app_dest = os.path.join(dest_dir, APP_REL)
     if os.path.exists(app_dest):
         shutil.rmtree(app_dest)
     
@@ -72,12 +84,15 @@ def main():
     if not os.path.exists(OUTPUT_DIR):
         os.makedirs(OUTPUT_DIR)
 
+    # Rebuild LocalLab.exe (pyinstaller LocalLab.spec) after this to pick it up
+    write_launcher_paths()
+
     # --- BUILD BASIC (CPU) ---
     # Strategy: Uninstall heavy GPU stuff, force CPU torch
     basic_cmds = [
         ["uninstall", "-y", "torch", "torchvision", "torchaudio", "styletts2"],
         ["install", "torch", "torchvision", "torchaudio", "--index-url", "https://download.pytorch.org/whl/cpu"],
-        ["install", "kokoro", "scipy", "soundfile", "fastapi", "uvicorn", "python-multipart"]
+        ["install", "kokoro", "scipy", "soundfile", "lameenc", "fastapi", "uvicorn", "python-multipart"]
     ]
     build_variant("LocalLab_Basic", BASIC_DIR, basic_cmds)
 
@@ -87,7 +102,7 @@ def main():
     pro_cmds = [
         ["uninstall", "-y", "torch", "torchvision", "torchaudio"],
         ["install", "torch", "torchvision", "torchaudio", "--index-url", "https://download.pytorch.org/whl/cu121"],
-        ["install", "styletts2", "kokoro", "scipy", "soundfile", "fastapi", "uvicorn", "python-multipart"]
+        ["install", "styletts2", "kokoro", "scipy", "soundfile", "lameenc", "fastapi", "uvicorn", "python-multipart"]
     ]
     build_variant("LocalLab_Pro", PRO_DIR, pro_cmds)
 
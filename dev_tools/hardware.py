@@ -1,84 +1,401 @@
 
+import os
+import sys
+import functools
 import subprocess
 import json
+import shutil
+import hashlib
 import logging
 import platform
+import re
+import threading
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Logging is configured by the host application (see __main__ below for standalone runs)
 logger = logging.getLogger(__name__)
 
+_IS_WINDOWS = (platform.system() == "Windows")
+
+# Detection results are cached on disk, keyed by a fingerprint of the system
+CACHE_FILE = os.path.join(os.path.expanduser("~"), ".locallab_hw_cache.json")
+
+# A wedged WMI/CIM service must not block the launcher forever
+PHYSICAL_PROBE_TIMEOUT = 5
+
+# The Torch probe has to import torch first; 10s covers slow HDDs/GPUs
+TORCH_PROBE_TIMEOUT = 10
+_HW_WORKER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "_hw_worker.py")
+
+# nvidia-smi only needs the driver, so it answers far quicker than torch
+DRIVER_PROBE_TIMEOUT = 3
+_NVIDIA_SMI_GPU_RE = re.compile(r'^GPU \d+: (.+) \(UUID:', re.MULTILINE)
+
+# torch/version.py records the CUDA version torch was built for (None on CPU-only builds)
+_TORCH_CUDA_RE = re.compile(r'^cuda\s*(?::[^=]*)?=\s*[\'"]([^\'"]+)[\'"]', re.MULTILINE)
+
+
+# The functional probe may ask for the physical answer while analyze_system is
+# still computing it, so concurrent callers share a single PowerShell run
+_PHYSICAL_LOCK = threading.Lock()
+
+
+def _physical_gpu():
+    """
+    Layer 1: Ask Windows 'Do I have an NVIDIA card?'
+    Returns the name of the card if found, False if the check ran and found
+    none, or None if the check couldn't run (non-Windows, WMI failure).
+    """
+    with _PHYSICAL_LOCK:
+        return _probe_physical()
+
+
+@functools.lru_cache(maxsize=1)
+def _probe_physical():
+    if not _IS_WINDOWS:
+        return None
+
+    proc = None
+    watchdog = None
+    try:
+        # Run PowerShell command to get video controller names (Cleaner & Modern)
+        # Direct argv (no cmd.exe) and -NoProfile (skip loading the user's profile)
+        # One name per line so the output can be streamed and abandoned early
+        cmd = ["powershell", "-NoProfile", "-Command",
+               "Get-CimInstance Win32_VideoController | Select-Object -ExpandProperty Name"]
+        proc = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            errors="ignore"
+        )
+        # Reading stdout blocks, so a timer kills a wedged child instead
+        watchdog = threading.Timer(PHYSICAL_PROBE_TIMEOUT, proc.kill)
+        watchdog.start()
+
+        # Check for NVIDIA, stopping at the first match
+        for line in proc.stdout:
+            if "NVIDIA" in line.upper():
+                proc.terminate()
+                return line.strip()
+
+        proc.wait(timeout=1)
+        if not watchdog.is_alive():
+            logger.warning(f"Physical GPU check timed out after {PHYSICAL_PROBE_TIMEOUT}s (WMI not responding)")
+            return None
+        if proc.returncode != 0:
+            logger.error(f"Physical GPU check failed: PowerShell exited with {proc.returncode}")
+            return None
+        return False
+
+    except Exception as e:
+        logger.error(f"Physical GPU check failed: {e}")
+        return None
+    finally:
+        if watchdog is not None:
+            watchdog.cancel()
+        if proc is not None:
+            try:
+                proc.stdout.close()
+                proc.wait(timeout=1)
+            except Exception:
+                proc.kill()
+
+
+def _probe_nvml():
+    """
+    Asks the NVIDIA driver directly through NVML (what nvidia-smi uses).
+    Takes milliseconds instead of importing torch in a subprocess.
+    Returns a functional status dict, or None if NVML is unavailable.
+    """
+    import ctypes
+
+    lib_name = "nvml.dll" if _IS_WINDOWS else "libnvidia-ml.so.1"
+    try:
+        nvml = ctypes.CDLL(lib_name)
+    except OSError:
+        return None  # Driver not installed
+
+    try:
+        if nvml.nvmlInit_v2() != 0:
+            return None
+    except (OSError, AttributeError):
+        return None
+
+    try:
+        count = ctypes.c_uint(0)
+        if nvml.nvmlDeviceGetCount_v2(ctypes.byref(count)) != 0:
+            return None
+        if count.value == 0:
+            return {"available": False, "error": "NVIDIA driver reports no GPUs"}
+
+        handle = ctypes.c_void_p()
+        if nvml.nvmlDeviceGetHandleByIndex_v2(0, ctypes.byref(handle)) != 0:
+            return None
+        name = ctypes.create_string_buffer(96)
+        if nvml.nvmlDeviceGetName(handle, name, 96) != 0:
+            return None
+
+        return {
+            "available": True,
+            "name": name.value.decode(errors="ignore"),
+            "count": count.value
+        }
+    except (OSError, AttributeError):
+        return None
+    finally:
+        try:
+            nvml.nvmlShutdown()
+        except (OSError, AttributeError):
+            pass
+
+
+def _driver_gpu():
+    """
+    Asks `nvidia-smi -L` which GPUs the CUDA driver can see.
+    Returns a functional status dict, or None if nvidia-smi is missing, hangs or lists nothing.
+    """
+    try:
+        result = subprocess.run(
+            ["nvidia-smi", "-L"],
+            timeout=DRIVER_PROBE_TIMEOUT,
+            capture_output=True
+        )
+    except subprocess.TimeoutExpired:
+        logger.warning(f"nvidia-smi timed out after {DRIVER_PROBE_TIMEOUT}s")
+        return None
+    except OSError:
+        return None  # nvidia-smi not installed
+
+    names = _NVIDIA_SMI_GPU_RE.findall(result.stdout.decode(errors="ignore"))
+    if result.returncode != 0 or not names:
+        return None
+
+    return {
+        "available": True,
+        "name": names[0].strip(),
+        "count": len(names)
+    }
+
+
+def _torch_cuda_build():
+    """
+    Whether the installed torch is a CUDA build, read from torch/version.py
+    without importing torch (the Basic build ships CPU-only torch).
+    """
+    import importlib.util
+
+    try:
+        spec = importlib.util.find_spec("torch")
+    except (ImportError, ValueError):
+        return False
+    if spec is None or not spec.submodule_search_locations:
+        return False
+
+    version_file = os.path.join(list(spec.submodule_search_locations)[0], "version.py")
+    try:
+        with open(version_file, "r", encoding="utf-8") as f:
+            return _TORCH_CUDA_RE.search(f.read()) is not None
+    except OSError:
+        return False
+
+
+def _pro_runtime_missing():
+    """What this install lacks to run Pro on a working GPU, or None if nothing"""
+    import importlib.util
+
+    if not _torch_cuda_build():
+        return "the installed PyTorch is CPU-only"
+    if importlib.util.find_spec("styletts2") is None:
+        return "the StyleTTS 2 (Pro) engine is not installed"
+    return None
+
+
+def _with_pro_runtime(status):
+    """
+    The driver probes only prove the driver can see a GPU. Pro also needs
+    CUDA-enabled torch and StyleTTS 2 in this install.
+    """
+    if status.get("available"):
+        missing = _pro_runtime_missing()
+        if missing:
+            return {
+                "available": False,
+                "driver_ok": True,
+                "name": status["name"],
+                "missing": missing,
+                "error": f"NVIDIA driver present, but {missing}"
+            }
+    return status
+
+
+def _torch_gpu():
+    """
+    Asks PyTorch through _hw_worker.py in a subprocess (to avoid hanging the
+    main app if drivers are stuck). The interpreter exits after answering, so
+    no torch-loaded process stays resident.
+    """
+    try:
+        result = subprocess.run(
+            [sys.executable, _HW_WORKER],
+            stdin=subprocess.DEVNULL,
+            timeout=TORCH_PROBE_TIMEOUT,
+            capture_output=True,
+            text=True
+        )
+        line = result.stdout.strip()
+        if not line:
+            return {"available": False, "error": f"Check failed: Torch probe exited with {result.returncode}"}
+        return json.loads(line)
+    except subprocess.TimeoutExpired:
+        return {"available": False, "error": "Detection timed out (Drivers might be hanging)"}
+    except Exception as e:
+        return {"available": False, "error": f"Check failed: {str(e)}"}
+
+
+@functools.lru_cache(maxsize=1)
+def _functional_gpu():
+    """
+    Layer 2: Ask the driver (NVML, then nvidia-smi) 'Can I use the GPU?'
+    Falls back to asking PyTorch in a subprocess (to avoid hanging the main
+    app if drivers are stuck) only when neither driver probe answers and
+    an NVIDIA card may be present.
+    """
+    nvml_status = _probe_nvml()
+    if nvml_status is not None:
+        return _with_pro_runtime(nvml_status)
+
+    driver_status = _driver_gpu()
+    if driver_status is not None:
+        return _with_pro_runtime(driver_status)
+
+    # Without an NVIDIA card torch can only say no - skip its multi-second import
+    if _physical_gpu() is False:
+        return {"available": False, "error": "No NVIDIA GPU present"}
+
+    return _with_pro_runtime(_torch_gpu())
+
+
 class HardwareDetector:
     """
     Detects available hardware (GPU) using a 2-Layer approach:
     1. Physical Layer (WMIC): Checks if an NVIDIA card is physically present.
-    2. Functional Layer (Torch): Checks if CUDA drivers are installed and usable.
+    2. Functional Layer (NVML, Torch fallback): Checks if CUDA drivers are installed and usable.
     """
 
-    @staticmethod
-    def get_physical_gpu():
+    # Probe results are cached for the life of the process (see invalidate())
+    get_physical_gpu = staticmethod(_physical_gpu)
+    get_functional_gpu = staticmethod(_functional_gpu)
+    get_driver_gpu = staticmethod(_driver_gpu)
+
+    @classmethod
+    def invalidate(cls):
         """
-        Layer 1: Ask Windows 'Do I have an NVIDIA card?'
-        Returns the name of the card if found, else None.
+        Clears the per-process probe caches (mainly for tests).
+        Needed after changing CUDA_VISIBLE_DEVICES or installing drivers
+        mid-process, since the cached answers won't notice.
         """
-        if platform.system() != "Windows":
-            return None
-            
-        try:
-            # Run PowerShell command to get video controller names (Cleaner & Modern)
-            cmd = 'powershell -Command "Get-CimInstance Win32_VideoController | Select-Object -ExpandProperty Name"'
-            result = subprocess.check_output(cmd, shell=True).decode()
-            
-            # Check for NVIDIA
-            for line in result.split('\n'):
-                if "NVIDIA" in line.upper():
-                    return line.strip()
-            return None
-            
-        except Exception as e:
-            logger.error(f"Physical GPU check failed: {e}")
-            return None
+        _probe_physical.cache_clear()
+        _functional_gpu.cache_clear()
 
     @staticmethod
-    def get_functional_gpu():
-        """
-        Layer 2: Ask PyTorch 'Can I use the GPU?'
-        Runs in a subprocess to avoid hanging the main app if drivers are stuck.
-        """
-        import sys
+    def _fingerprint():
+        """Identifies the hardware/driver setup a cached result is valid for"""
+        key = (
+            platform.system(), platform.machine(), platform.version(),
+            shutil.which("nvidia-smi") is not None,
+            _pro_runtime_missing()  # Basic and Pro installs share the cache file
+        )
+        return hashlib.sha1(repr(key).encode()).hexdigest()
+
+    @classmethod
+    def _load_cache(cls, fingerprint):
+        """Returns the cached status if it matches this system, else None"""
         try:
-            # Run a mini-script to check Torch
-            script = "import torch; print(f'{torch.cuda.is_available()}|{torch.cuda.get_device_name(0) if torch.cuda.is_available() else \"None\"}')"
-            cmd = [sys.executable, "-c", script]
-            
-            # Run in subprocess to avoid main process freeze
-            # 10s timeout should be enough for even slow HDDs/GPUs
-            result = subprocess.check_output(
-                cmd, 
-                timeout=10,
-                stderr=subprocess.DEVNULL
-            ).decode().strip()
-            available, name = result.split('|')
-            
-            return {
-                "available": available == "True",
-                "name": name,
-                "count": 1 if available == "True" else 0
-            }
-        except subprocess.TimeoutExpired:
-            return {"available": False, "error": "Detection timed out (Drivers might be hanging)"}
-        except Exception as e:
-            return {"available": False, "error": f"Check failed: {str(e)}"}
+            with open(CACHE_FILE, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+            if cached.get("fingerprint") == fingerprint:
+                return cached["status"]
+        except (OSError, ValueError, KeyError):
+            pass
+        return None
+
+    @classmethod
+    def _save_cache(cls, fingerprint, status):
+        """Writes the cache atomically (temp file + os.replace)"""
+        import tempfile
+
+        try:
+            cache_dir = os.path.dirname(CACHE_FILE)
+            with tempfile.NamedTemporaryFile("w", dir=cache_dir, delete=False, encoding="utf-8", suffix=".tmp") as f:
+                json.dump({"fingerprint": fingerprint, "status": status}, f)
+                tmp_path = f.name
+            os.replace(tmp_path, CACHE_FILE)
+        except OSError as e:
+            logger.warning(f"Could not write hardware cache: {e}")
+
+    @classmethod
+    def clear_cache(cls):
+        """Deletes the on-disk detection cache (forces a fresh probe next time)"""
+        try:
+            os.remove(CACHE_FILE)
+            return True
+        except FileNotFoundError:
+            return False
 
     @classmethod
     def analyze_system(cls):
         """
         Combines both layers to give a final verdict.
-        Returns a Status Dictionary.
+        Returns a Status Dictionary (served from the disk cache when the system is unchanged).
         """
-        physical_card = cls.get_physical_gpu()
-        functional_status = cls.get_functional_gpu()
+        fingerprint = cls._fingerprint()
+        cached = cls._load_cache(fingerprint)
+        if cached is not None:
+            return cached
         
+        # Only a cache miss needs the thread pool
+        from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+        # Both probes mostly wait on subprocesses (GIL released), so overlap them
+        ex = ThreadPoolExecutor(max_workers=2)
+        try:
+            future_phys = ex.submit(cls.get_physical_gpu)
+            future_func = ex.submit(cls.get_functional_gpu)
+            done, _ = wait((future_phys, future_func), return_when=FIRST_COMPLETED)
+            
+            if future_phys in done and future_phys.result() is False and not future_func.done():
+                # No NVIDIA card at all - don't wait for the functional probe
+                # (it sees the same answer and skips the Torch fallback)
+                physical_card = False
+                functional_status = {"available": False, "error": "No NVIDIA GPU present"}
+            else:
+                physical_card = future_phys.result()
+                functional_status = future_func.result()
+        finally:
+            # Don't block on a probe we abandoned; it finishes quickly (and is cached) in the background
+            ex.shutdown(wait=False)
+        status = cls._build_status(physical_card, functional_status)
+        
+        # Only persist a definitive answer - a timeout or crash may not happen next time
+        if cls._is_definitive(physical_card, functional_status):
+            cls._save_cache(fingerprint, status)
+        return status
+
+    @staticmethod
+    def _is_definitive(physical_card, functional_status):
+        """Whether the probe results can be cached (no timeouts or transient failures)"""
+        if physical_card is None and _IS_WINDOWS:
+            return False  # WMI timed out or failed
+        if physical_card is False:
+            return True   # No NVIDIA card - the functional layer can't change the verdict
+        if functional_status.get("driver_ok"):
+            return True   # Working GPU, but this install can't use it (part of the fingerprint)
+        return "error" not in functional_status
+
+    @staticmethod
+    def _build_status(physical_card, functional_status):
+        """Turns the two layer results into the final status dictionary"""
         status = {
             "platform": "Unknown",
             "message": "",
@@ -93,14 +410,21 @@ class HardwareDetector:
             status["can_run_pro"] = True
             status["details"] = functional_status
             
-        # Case 2: Physical GPU exists, but Functional failed ⚠️
+        # Case 2: GPU works, but this install can't use it (e.g. Basic build) 📦
+        elif functional_status.get("driver_ok"):
+            status["platform"] = "GPU_PRO_NOT_INSTALLED"
+            status["message"] = f"📦 NVIDIA GPU Detected ({functional_status['name']}), but {functional_status['missing']}. Pro Mode needs the Pro build."
+            status["can_run_pro"] = False
+            status["details"] = functional_status
+            
+        # Case 3: Physical GPU exists, but Functional failed ⚠️
         elif physical_card:
             status["platform"] = "GPU_DRIVER_MISSING"
             status["message"] = f"⚠️ NVIDIA GPU Detected ({physical_card}), but CUDA drivers are missing."
             status["can_run_pro"] = False
             status["details"] = {"physical_card": physical_card, "error": functional_status.get("error")}
             
-        # Case 3: No GPU found🥔
+        # Case 4: No GPU found🥔
         else:
             status["platform"] = "CPU_ONLY"
             status["message"] = "🥔 Standard Mode (CPU Only)"
@@ -110,4 +434,5 @@ class HardwareDetector:
 
 if __name__ == "__main__":
     # Test run
+    logging.basicConfig(level=logging.INFO)
     print(json.dumps(HardwareDetector.analyze_system(), indent=2))
@@ -2,12 +2,53 @@
 import os
 import subprocess
 import sys
-import webbrowser
+import socket
+import threading
 import time
 
+_IS_WINDOWS = (sys.platform == "win32")
+
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8000
+STARTUP_TIMEOUT = 30  # seconds
+
+# Windows process creation flags for a fully detached server
+DETACHED_PROCESS = 0x00000008
+CREATE_NEW_PROCESS_GROUP = 0x00000200
+CREATE_BREAKAWAY_FROM_JOB = 0x01000000
+
+
+def wait_for_server(host, port, timeout):
+    """Polls the port until the server accepts connections. Returns True if it came up."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+            s.settimeout(0.2)
+            if s.connect_ex((host, port)) == 0:
+                return True
+        time.sleep(0.1)
+    return False
+
+
+def open_browser_when_ready():
+    """Open the UI as soon as port 8000 accepts connections"""
+    import webbrowser  # Only needed once the server is up
+    
+    if not wait_for_server(SERVER_HOST, SERVER_PORT, STARTUP_TIMEOUT):
+        print(f"Server not ready after {STARTUP_TIMEOUT}s, opening browser anyway")
+    
+    webbrowser.open(f"http://localhost:{SERVER_PORT}")
+
+
 def main():
+    # Forget the cached hardware detection (e.g. after a driver change)
+    if "--clear-hw-cache" in sys.argv:
+        from hardware import HardwareDetector
+        if HardwareDetector.clear_cache():
+            print("Hardware detection cache cleared")
+
     # Hide the console window
-    if sys.platform == "win32":
+    if _IS_WINDOWS:
         import ctypes
         kernel32 = ctypes.WinDLL('kernel32')
         user32 = ctypes.WinDLL('user32')
@@ -22,48 +63,76 @@ def main():
         base_dir = os.path.dirname(os.path.abspath(__file__))
 
     # Define paths
-    app_dir = os.path.join(base_dir, "app")
-    python_exe = os.path.join(base_dir, "python", "python.exe")
     app_script = "app.py"
+    app_dir = python_exe = None
+    if getattr(sys, 'frozen', False):
+        # Layout baked in by build_release.py - the release tree is known to be complete.
+        # Source runs skip it: build_release.py leaves _launcher_paths.py next to this file.
+        try:
+            from _launcher_paths import PYTHON_EXE, APP_DIR
+            app_dir = os.path.join(base_dir, APP_DIR)
+            python_exe = os.path.join(base_dir, PYTHON_EXE)
+        except ImportError:
+            pass
+
+    if app_dir is None:
+        app_dir = os.path.join(base_dir, "app")
+        python_exe = os.path.join(base_dir, "python", "python.exe")
 
-    # Ensure paths exist
-    if not os.path.exists(python_exe):
-        # Fallback if folder structure is wrong (e.g. debugging)
-        python_exe = sys.executable
+        # Ensure paths exist
+        if not os.path.exists(python_exe):
+            # Fallback if folder structure is wrong (e.g. debugging)
+            python_exe = sys.executable
+
+    # Already running on the target interpreter? Host the app in this process
+    # instead of spawning a second copy of Python
+    same_interpreter = os.path.normcase(os.path.abspath(python_exe)) == os.path.normcase(os.path.abspath(sys.executable))
+    if same_interpreter and not getattr(sys, 'frozen', False):
+        print(f"Starting Local Lab in-process from {app_dir}")
+        os.chdir(app_dir)  # app.py resolves frontend/ relative to the cwd
+        sys.path.insert(0, app_dir)
+        threading.Thread(target=open_browser_when_ready, daemon=True).start()
+        import app
+        app.main()
+        return
 
     # Setup environment
     env = os.environ.copy()
     env["PYTHONPATH"] = app_dir
+    # With no console, Windows falls back to the ANSI code page (cp1252) for
+    # stdout and the emoji in the server's log lines raise UnicodeEncodeError
+    env["PYTHONIOENCODING"] = "utf-8"
 
     # Command to run: python.exe app.py
     cmd = [python_exe, app_script]
 
     print(f"Starting Local Lab in {app_dir}")
     
-    # Start the application process (hidden)
-    # creationflags=0x08000000 is CREATE_NO_WINDOW
-    process = subprocess.Popen(
-        cmd, 
+    # Start the application as a true daemon: no console, own process group,
+    # outside the launcher's job, no inherited handles (so stray Ctrl-C or the
+    # launcher exiting can't take it down)
+    popen_kwargs = dict(
         cwd=app_dir,
         env=env,
-        creationflags=0x08000000 
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        close_fds=True
     )
+    if _IS_WINDOWS:
+        flags = DETACHED_PROCESS | CREATE_NEW_PROCESS_GROUP
+        try:
+            subprocess.Popen(cmd, creationflags=flags | CREATE_BREAKAWAY_FROM_JOB, **popen_kwargs)
+        except OSError:
+            # The launcher's job doesn't allow breakaway - stay in it
+            subprocess.Popen(cmd, creationflags=flags, **popen_kwargs)
+    else:
+        subprocess.Popen(cmd, start_new_session=True, **popen_kwargs)
+
+    open_browser_when_ready()
+
+    # The server is fully detached, nothing left to hold on to
+    os._exit(0)
 
-    # Calculate optimal wait time
-    # Check port 8000 availability
-    server_ready = False
-    for _ in range(15): # Try for 15 seconds
-        time.sleep(1)
-        # We assume it will open
-    
-    # Force open browser
-    time.sleep(2)
-    webbrowser.open("http://localhost:8000")
-
-    # Keep launcher alive to monitor process? 
-    # No, let it exit effectively making it a true background process
-    # But wait, if we exit, the child process might die if not detached?
-    # Popen usage above allows it to run independently.
-    
 if __name__ == "__main__":
     main()
@@ -14,6 +14,7 @@ const state = {
     isGenerating: false,
     currentAudioUrl: null,
     currentAudioUrlMp3: null,
+    streaming: false,
     voices: {},
     previewAudio: null,
     previewTimeout: null,
@@ -123,6 +124,19 @@ async function checkHardwareStatus() {
                     if (proTitle) proTitle.textContent = "🔒 Drivers Missing";
                 }
 
+            } else if (data.platform === 'GPU_PRO_NOT_INSTALLED') {
+                badge.innerHTML = `<span class="badge-dot" style="background:#f59e0b; box-shadow:0 0 8px #f59e0b"></span> Basic Build`;
+                badge.style.color = '#f59e0b';
+                badge.style.borderColor = 'rgba(245, 158, 11, 0.3)';
+                badge.title = data.message;
+
+                // GPU works, but this install has no CUDA torch / StyleTTS 2
+                const proCard = document.getElementById('model-pro');
+                if (proCard) {
+                    proCard.classList.add('disabled');
+                    document.getElementById('pro-lock').classList.remove('hidden');
+                }
+
             } else {
                 badge.innerHTML = `<span class="badge-dot" style="background:#94a3b8"></span> CPU Mode`;
                 badge.style.color = '#94a3b8';
@@ -150,6 +164,8 @@ function selectModel(modelType) {
         if (!state.hardware || !state.hardware.can_run_pro) {
             if (state.hardware && state.hardware.platform === 'GPU_DRIVER_MISSING') {
                 showToast("Please install NVIDIA drivers first", "warning");
+            } else if (state.hardware && state.hardware.platform === 'GPU_PRO_NOT_INSTALLED') {
+                showToast("Pro Mode requires the Pro (GPU) build", "warning");
             } else {
                 showToast("Pro Mode requires an NVIDIA GPU", "error");
             }
@@ -209,7 +225,8 @@ async function generateVoice() {
     updateUIState();
 
     try {
-        const response = await fetch('/api/synthesize', {
+        // Register the request, then let the player stream it as it is generated
+        const response = await fetch('/api/synthesize/stream/job', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json'
@@ -230,18 +247,21 @@ async function generateVoice() {
         }
 
         if (data.success) {
-            // Store audio URLs
+            // Store audio URLs (the saved files exist once streaming has finished)
             state.currentAudioUrl = data.audio_url;
             state.currentAudioUrlMp3 = data.audio_url_mp3;
+            state.streaming = true;
 
             // Update audio player
-            elements.audioElement.src = data.audio_url;
-            elements.audioDuration.textContent = `Duration: ${formatDuration(data.duration)}`;
+            elements.audioElement.preload = 'none';
+            elements.audioElement.src = data.stream_url;
+            elements.audioDuration.textContent = 'Duration: streaming...';
             elements.voiceUsed.textContent = `Voice: ${state.voices[state.selectedVoice]?.name || state.selectedVoice}`;
 
-            // Show/hide MP3 button based on availability
+            // Downloads are offered once the saved files are ready
+            elements.downloadBtn.style.display = 'none';
             if (elements.downloadMp3Btn) {
-                elements.downloadMp3Btn.style.display = data.audio_url_mp3 ? 'flex' : 'none';
+                elements.downloadMp3Btn.style.display = 'none';
             }
 
             // Show player
@@ -249,8 +269,6 @@ async function generateVoice() {
 
             // Auto-play
             elements.audioElement.play();
-
-            showToast(`Generated ${formatDuration(data.duration)} of audio!`, 'success');
         }
     } catch (error) {
         console.error('Generation error:', error);
@@ -262,6 +280,31 @@ async function generateVoice() {
     }
 }
 
+function finishStreaming() {
+    // Swap the one-shot stream for the saved file so the player can seek and replay
+    state.streaming = false;
+    elements.audioElement.preload = 'metadata';
+    elements.audioElement.src = state.currentAudioUrl;
+    elements.audioElement.addEventListener('loadedmetadata', () => {
+        const duration = elements.audioElement.duration;
+        elements.audioDuration.textContent = `Duration: ${formatDuration(duration)}`;
+        showToast(`Generated ${formatDuration(duration)} of audio!`, 'success');
+    }, { once: true });
+
+    elements.downloadBtn.style.display = 'flex';
+
+    // The MP3 is only there if the server could encode one
+    if (elements.downloadMp3Btn) {
+        const controller = new AbortController();
+        fetch(state.currentAudioUrlMp3, { signal: controller.signal })
+            .then(response => {
+                controller.abort();
+                elements.downloadMp3Btn.style.display = response.ok ? 'flex' : 'none';
+            })
+            .catch(() => {});
+    }
+}
+
 // ============================================
 // Voice Preview
 // ============================================
@@ -427,6 +470,17 @@ function setupEventListeners() {
 
     elements.audioElement.addEventListener('ended', () => {
         elements.waveform.classList.add('paused');
+        if (state.streaming) {
+            finishStreaming();
+        }
+    });
+
+    elements.audioElement.addEventListener('error', () => {
+        if (state.streaming) {
+            state.streaming = false;
+            showToast('Failed to generate audio', 'error');
+            showEmptyState();
+        }
     });
 
     // Download WAV button